@@ -1,30 +1,160 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import joblib
+import orjson
 import numpy as np
+import onnxruntime as ort
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import gzip
+import time
+import hashlib
+import uuid
+import functools
+import queue
+import atexit
 import logging
-import pandas as pd
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 
-def log_prediction(data, prediction, category):
-    log_file = "aqi_prediction_log.csv"
+# Input parameters, in the column order the model was trained on
+_REQUIRED = ('pm25', 'pm10', 'no2', 'so2', 'co', 'o3', 'temperature', 'humidity')
+_DISPLAY_NAMES = ('PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3', 'Temperature', 'Humidity')
 
-    # Add AQI and category to input data
-    data['Predicted_AQI'] = round(prediction, 1)
-    data['Category'] = category
-    data['Timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Prediction log: request handlers enqueue rows, a background thread writes them
+# to a Parquet dataset partitioned by hour (aqi_logs/date_hour=YYYYMMDDHH/).
+# Rows are buffered and written as one complete file per process every minute
+# (or per hour change, or 65536 rows), since tiny per-second files each carry
+# ~3 KB of Parquet metadata. A process killed without running its exit hooks
+# (SIGKILL, OOM) therefore loses at most the last ~_LOG_ROTATE seconds of rows.
+_LOG_DIR = "aqi_logs"
+_LOG_SCHEMA = pa.schema(
+    [(feature, pa.float64()) for feature in _REQUIRED] + [
+        ('Predicted_AQI', pa.float64()),
+        ('Category', pa.string()),
+        ('Timestamp', pa.timestamp('us'))
+    ]
+)
+_LOG_BATCH = 256
+_LOG_WAIT = 1.0
+_LOG_ROTATE = 60.0
+_LOG_MAX_ROWS = 65536
+_LOG_Q = queue.Queue()
 
-    df = pd.DataFrame([data])  # wrap in list to create 1-row DataFrame
+# Writer-thread state: the hour being logged, its buffered rows and when the
+# oldest of them has to be on disk
+_log_hour = None
+_log_rows = []
+_log_deadline = None
 
-    # Append to CSV
-    if not os.path.exists(log_file):
-        df.to_csv(log_file, index=False)
-    else:
-        df.to_csv(log_file, mode='a', index=False, header=False)
+def log_prediction(values, prediction, category):
+    """Queue a prediction (feature values in _REQUIRED order) for the background log writer"""
+    _LOG_Q.put((*values, round(prediction, 1), category, datetime.now()))
+
+def _date_hour(t):
+    """Partition key (YYYYMMDDHH) for a timestamp"""
+    return t.year * 1000000 + t.month * 10000 + t.day * 100 + t.hour
+
+def _write_log_file():
+    """Write the buffered rows to a new file in their hour's partition"""
+    global _log_deadline
+    try:
+        if _log_rows:
+            # Transpose the queued tuples into columns here, keeping the per-request
+            # side of logging to a single tuple
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(zip(*_log_rows), _LOG_SCHEMA)],
+                schema=_LOG_SCHEMA
+            )
+            path = os.path.join(_LOG_DIR, f"date_hour={_log_hour}")
+            os.makedirs(path, exist_ok=True)
+            pq.write_table(table, os.path.join(path, f"{uuid.uuid4().hex}.parquet"))
+    except Exception as e:
+        logger.error(f"Error writing prediction log: {str(e)}")
+    _log_rows.clear()
+    _log_deadline = None
+
+def _write_log_rows(rows):
+    """Buffer a batch of rows, writing a file when the hour changes or the buffer is due"""
+    global _log_hour, _log_deadline
+    for row in rows:
+        hour = _date_hour(row[-1])
+        if hour != _log_hour:
+            _write_log_file()
+            _log_hour = hour
+        if not _log_rows:
+            _log_deadline = time.monotonic() + _LOG_ROTATE
+        _log_rows.append(row)
+        if len(_log_rows) >= _LOG_MAX_ROWS:
+            _write_log_file()
+    if _log_deadline is not None and time.monotonic() >= _log_deadline:
+        _write_log_file()
+
+def _flush_loop():
+    """Collect queued rows for up to a second (or one batch) and buffer them"""
+    stopping = False
+    while not stopping:
+        try:
+            # Wake up when buffered rows are due even if no more requests arrive
+            timeout = None if _log_deadline is None else max(_log_deadline - time.monotonic(), 0)
+            row = _LOG_Q.get(timeout=timeout)
+        except queue.Empty:
+            _write_log_file()
+            continue
+        rows = []
+        deadline = time.monotonic() + _LOG_WAIT
+        while True:
+            # None is the shutdown sentinel queued by _stop_log_writer
+            if row is None:
+                stopping = True
+                break
+            rows.append(row)
+            remaining = deadline - time.monotonic()
+            if len(rows) >= _LOG_BATCH or remaining <= 0:
+                break
+            try:
+                row = _LOG_Q.get(timeout=remaining)
+            except queue.Empty:
+                break
+        if rows:
+            _write_log_rows(rows)
+    _write_log_file()
+
+def _stop_log_writer():
+    """Flush queued rows before the process exits"""
+    _LOG_Q.put(None)
+    _log_thread.join(timeout=5)
+
+# pyarrow imports pandas on its first conversion; do that now rather than
+# (possibly) inside the exit-time flush, when imports can no longer start threads
+pa.array([], type=pa.float64())
+
+_log_thread = threading.Thread(target=_flush_loop, daemon=True)
+_log_thread.start()
+atexit.register(_stop_log_writer)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that parses and serializes with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_INDENT_2 if self._app.debug else 0
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
 
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 
@@ -32,18 +162,25 @@ CORS(app)  # Enable CORS for all routes
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global variables for model and scaler
-model = None
-scaler = None
+# Global ONNX model session
+session = None
+input_name = None
 
 def load_model():
-    """Load the trained model and scaler"""
-    global model, scaler
+    """Load the trained model"""
+    global session, input_name
     try:
-        if os.path.exists('aqi_model.pkl') and os.path.exists('scaler.pkl'):
-            model = joblib.load('aqi_model.pkl')
-            scaler = joblib.load('scaler.pkl')
-            logger.info("Model and scaler loaded successfully")
+        if os.path.exists('aqi_model.onnx'):
+            options = ort.SessionOptions()
+            # Single-row requests are faster without intra-op thread hand-off
+            options.intra_op_num_threads = 1
+            session = ort.InferenceSession(
+                'aqi_model.onnx', options, providers=['CPUExecutionProvider']
+            )
+            input_name = session.get_inputs()[0].name
+            _cached_predict.cache_clear()
+            _warmup()
+            logger.info("Model loaded successfully")
             return True
         else:
             logger.error("Model files not found. Please run model_train.py first.")
@@ -52,37 +189,100 @@ def load_model():
         logger.error(f"Error loading model: {str(e)}")
         return False
 
+def _warmup():
+    """Run throwaway predictions so the first request doesn't pay one-time setup costs"""
+    for rows in (1, 64):
+        _predict_array(np.zeros((rows, len(_REQUIRED))))
+
+def _predict_array(features):
+    """Run the model on an (N, 8) feature array and return the AQI values"""
+    aqi = session.run(None, {input_name: features.astype(np.float32)})[0].ravel()
+    # Ensure AQI is within reasonable bounds
+    return np.clip(aqi, 0, 500)
+
+# AQI category upper bounds (inclusive) and the matching labels/colors
+_BREAKS = np.array([50, 100, 150, 200, 300])
+_CATS = np.array([
+    "Good",
+    "Moderate",
+    "Unhealthy for Sensitive Groups",
+    "Unhealthy",
+    "Very Unhealthy",
+    "Hazardous"
+], dtype=object)
+_COLORS = np.array(["#00E400", "#FFFF00", "#FF7E00", "#FF0000", "#8F3F97", "#7E0023"], dtype=object)
+
+def _invalid_feature(data):
+    """Return the first parameter that is not a finite number (error path only)"""
+    for feature in _REQUIRED:
+        try:
+            if np.isfinite(float(data[feature])):
+                continue
+        except (ValueError, TypeError):
+            pass
+        return feature
+
 def get_aqi_category(aqi):
     """Get AQI category based on AQI value"""
-    if aqi <= 50:
-        return "Good", "#00E400"
-    elif aqi <= 100:
-        return "Moderate", "#FFFF00"
-    elif aqi <= 150:
-        return "Unhealthy for Sensitive Groups", "#FF7E00"
-    elif aqi <= 200:
-        return "Unhealthy", "#FF0000"
-    elif aqi <= 300:
-        return "Very Unhealthy", "#8F3F97"
-    else:
-        return "Hazardous", "#7E0023"
+    idx = int(np.digitize(aqi, _BREAKS, right=True))
+    return _CATS[idx], _COLORS[idx]
+
+def get_aqi_categories(aqi):
+    """Get AQI categories and colors for an array of AQI values"""
+    idx = np.digitize(aqi, _BREAKS, right=True)
+    return _CATS[idx], _COLORS[idx]
+
+@functools.lru_cache(maxsize=4096)
+def _cached_predict(values):
+    """Predict AQI, category and color for one feature tuple, memoizing repeats"""
+    aqi = float(_predict_array(np.array([values]))[0])
+    category, color = get_aqi_category(aqi)
+    return aqi, category, color
+
+# Front-end assets are few and small, so they are read into memory once
+_MIME = {'.html': 'text/html', '.css': 'text/css', '.js': 'text/javascript'}
+
+def _load_static():
+    """Read the front-end files in the project directory into memory"""
+    static = {}
+    # Resolve against the app's root like send_from_directory did, not the working directory
+    for name in os.listdir(app.root_path):
+        path = os.path.join(app.root_path, name)
+        mimetype = _MIME.get(os.path.splitext(name)[1])
+        if mimetype and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                body = f.read()
+            # ETag and Last-Modified let browsers revalidate with a 304 instead of refetching
+            etag = hashlib.md5(body, usedforsecurity=False).hexdigest()
+            mtime = datetime.fromtimestamp(int(os.path.getmtime(path)), timezone.utc)
+            static[name] = (body, mimetype, etag, mtime)
+    return static
+
+_STATIC = _load_static()
 
 @app.route('/')
 def index():
     """Serve the main page"""
-    return send_from_directory('.', 'index.html')
+    return serve_static('index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     """Serve static files"""
-    return send_from_directory('.', filename)
+    # Only names loaded at startup are served, which also rules out path traversal
+    if filename not in _STATIC:
+        abort(404)
+    body, mimetype, etag, mtime = _STATIC[filename]
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = mtime
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(body))
 
 @app.route('/api/predict', methods=['POST'])
 def predict_aqi():
     """Predict AQI based on input parameters"""
     try:
         # Check if model is loaded
-        if model is None or scaler is None:
+        if session is None:
             return jsonify({
                 'error': 'Model not loaded. Please ensure model files exist and restart the server.'
             }), 500
@@ -93,67 +293,44 @@ def predict_aqi():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Extract features
-        required_features = ['pm25', 'pm10', 'no2', 'so2', 'co', 'o3', 'temperature', 'humidity']
-        
-        # Validate input
-        for feature in required_features:
-            if feature not in data:
-                return jsonify({'error': f'Missing required parameter: {feature}'}), 400
-            
-            # Convert to float and validate
-            try:
-                value = float(data[feature])
-                if value < 0:
-                    return jsonify({'error': f'Invalid value for {feature}: must be non-negative'}), 400
-                data[feature] = value
-            except (ValueError, TypeError):
-                return jsonify({'error': f'Invalid value for {feature}: must be a number'}), 400
-        
-        # Prepare features for prediction
-        features = np.array([[
-            data['pm25'],
-            data['pm10'], 
-            data['no2'],
-            data['so2'],
-            data['co'],
-            data['o3'],
-            data['temperature'],
-            data['humidity']
-        ]])
+        # Build and validate the feature vector in one pass
+        try:
+            features = np.fromiter(
+                (data[feature] for feature in _REQUIRED),
+                dtype=np.float64,
+                count=len(_REQUIRED)
+            ).reshape(1, -1)
+        except KeyError as e:
+            return jsonify({'error': f'Missing required parameter: {e.args[0]}'}), 400
+        except (ValueError, TypeError):
+            features = None
         
-        # Scale features
-        features_scaled = scaler.transform(features)
+        # NumPy turns null into NaN and accepts "inf" instead of raising,
+        # so reject non-finite values as well
+        if features is None or not np.isfinite(features).all():
+            feature = _invalid_feature(data)
+            return jsonify({'error': f'Invalid value for {feature}: must be a number'}), 400
         
-        # Make prediction
-        aqi_prediction = model.predict(features_scaled)[0]
+        negative = features[0] < 0
+        if negative.any():
+            feature = _REQUIRED[int(negative.argmax())]
+            return jsonify({'error': f'Invalid value for {feature}: must be non-negative'}), 400
         
-        # Ensure AQI is within reasonable bounds
-        aqi_prediction = max(0, min(500, aqi_prediction))
-        
-        # Get category and color
-        category, color = get_aqi_category(aqi_prediction)
+        # Make prediction; sensors often resend identical readings, so repeats
+        # are answered from the cache without running the model
+        aqi_prediction, category, color = _cached_predict(tuple(features[0].tolist()))
         
         # Prepare response
         response = {
             'aqi': round(aqi_prediction, 1),
             'category': category,
             'color': color,
-            'input_data': {
-                'PM2.5': data['pm25'],
-                'PM10': data['pm10'],
-                'NO2': data['no2'],
-                'SO2': data['so2'],
-                'CO': data['co'],
-                'O3': data['o3'],
-                'Temperature': data['temperature'],
-                'Humidity': data['humidity']
-            }
+            'input_data': dict(zip(_DISPLAY_NAMES, features[0].tolist()))
         }
         
         logger.info(f"Prediction made: AQI = {aqi_prediction:.1f}, Category = {category}")
         # Log the prediction
-        log_prediction(data, aqi_prediction, category)
+        log_prediction(features[0].tolist(), aqi_prediction, category)
 
         return jsonify(response)
         
@@ -161,70 +338,161 @@ def predict_aqi():
         logger.error(f"Error in prediction: {str(e)}")
         return jsonify({'error': 'An error occurred during prediction'}), 500
 
+# Upper bound on samples per batch request (each one is also logged)
+_MAX_BATCH = 1000
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_aqi_batch():
+    """Predict AQI for a list of input parameter sets in one model call"""
+    try:
+        # Check if model is loaded
+        if session is None:
+            return jsonify({
+                'error': 'Model not loaded. Please ensure model files exist and restart the server.'
+            }), 500
+        
+        # Get JSON data from request
+        data = request.get_json()
+        
+        if not data or not isinstance(data, list):
+            return jsonify({'error': 'Expected a non-empty list of input parameter sets'}), 400
+        
+        if len(data) > _MAX_BATCH:
+            return jsonify({'error': f'Too many samples: at most {_MAX_BATCH} per request'}), 400
+        
+        # Stack all samples into one (N, 8) array
+        features = np.empty((len(data), len(_REQUIRED)))
+        for row, sample in enumerate(data):
+            try:
+                features[row] = [sample[feature] for feature in _REQUIRED]
+            except KeyError as e:
+                return jsonify({
+                    'error': f'Missing required parameter: {e.args[0]} in sample {row}'
+                }), 400
+            except (ValueError, TypeError):
+                features[row] = np.nan
+            
+            # NumPy turns null into NaN and accepts "inf" instead of raising,
+            # so reject non-finite values as well
+            if not np.isfinite(features[row]).all():
+                feature = _invalid_feature(sample)
+                return jsonify({
+                    'error': f'Invalid value for {feature} in sample {row}: must be a number'
+                }), 400
+        
+        negative = features < 0
+        if negative.any():
+            row, col = np.argwhere(negative)[0]
+            return jsonify({
+                'error': f'Invalid value for {_REQUIRED[col]} in sample {row}: must be non-negative'
+            }), 400
+        
+        # Make predictions
+        aqi_predictions = _predict_array(features)
+        
+        categories, colors = get_aqi_categories(aqi_predictions)
+        
+        results = []
+        for sample, aqi_prediction, category, color in zip(
+            features, aqi_predictions.tolist(), categories, colors
+        ):
+            results.append({
+                'aqi': round(aqi_prediction, 1),
+                'category': category,
+                'color': color
+            })
+            log_prediction(sample.tolist(), aqi_prediction, category)
+        
+        logger.info(f"Batch prediction made: {len(results)} samples")
+        
+        return jsonify(results)
+        
+    except Exception as e:
+        logger.error(f"Error in batch prediction: {str(e)}")
+        return jsonify({'error': 'An error occurred during prediction'}), 500
+
+# Sample datasets are static, so they are serialized (and gzipped) once at import
+_SAMPLE_DATASETS = [
+    {
+        'name': 'Good Air Quality',
+        'data': {
+            'pm25': 8.5,
+            'pm10': 15.2,
+            'no2': 12.3,
+            'so2': 2.1,
+            'co': 0.4,
+            'o3': 45.2,
+            'temperature': 22.5,
+            'humidity': 55.0
+        }
+    },
+    {
+        'name': 'Moderate Air Quality',
+        'data': {
+            'pm25': 25.4,
+            'pm10': 45.8,
+            'no2': 35.6,
+            'so2': 8.2,
+            'co': 1.2,
+            'o3': 85.3,
+            'temperature': 28.1,
+            'humidity': 68.5
+        }
+    },
+    {
+        'name': 'Unhealthy Air Quality',
+        'data': {
+            'pm25': 95.6,
+            'pm10': 155.2,
+            'no2': 75.4,
+            'so2': 25.1,
+            'co': 8.5,
+            'o3': 145.8,
+            'temperature': 35.2,
+            'humidity': 45.3
+        }
+    },
+    {
+        'name': 'Very Unhealthy Air Quality',
+        'data': {
+            'pm25': 185.3,
+            'pm10': 285.7,
+            'no2': 125.8,
+            'so2': 45.6,
+            'co': 15.2,
+            'o3': 205.4,
+            'temperature': 38.7,
+            'humidity': 35.8
+        }
+    }
+]
+_SAMPLE_BYTES = orjson.dumps(_SAMPLE_DATASETS)
+_SAMPLE_GZ = gzip.compress(_SAMPLE_BYTES, 6)
+_SAMPLE_ETAG = hashlib.md5(_SAMPLE_BYTES, usedforsecurity=False).hexdigest()
+_SAMPLE_GZ_ETAG = f"{_SAMPLE_ETAG}-gz"
+
 @app.route('/api/sample-data', methods=['GET'])
 def get_sample_data():
     """Get sample air quality data"""
-    sample_datasets = [
-        {
-            'name': 'Good Air Quality',
-            'data': {
-                'pm25': 8.5,
-                'pm10': 15.2,
-                'no2': 12.3,
-                'so2': 2.1,
-                'co': 0.4,
-                'o3': 45.2,
-                'temperature': 22.5,
-                'humidity': 55.0
-            }
-        },
-        {
-            'name': 'Moderate Air Quality',
-            'data': {
-                'pm25': 25.4,
-                'pm10': 45.8,
-                'no2': 35.6,
-                'so2': 8.2,
-                'co': 1.2,
-                'o3': 85.3,
-                'temperature': 28.1,
-                'humidity': 68.5
-            }
-        },
-        {
-            'name': 'Unhealthy Air Quality',
-            'data': {
-                'pm25': 95.6,
-                'pm10': 155.2,
-                'no2': 75.4,
-                'so2': 25.1,
-                'co': 8.5,
-                'o3': 145.8,
-                'temperature': 35.2,
-                'humidity': 45.3
-            }
-        },
-        {
-            'name': 'Very Unhealthy Air Quality',
-            'data': {
-                'pm25': 185.3,
-                'pm10': 285.7,
-                'no2': 125.8,
-                'so2': 45.6,
-                'co': 15.2,
-                'o3': 205.4,
-                'temperature': 38.7,
-                'humidity': 35.8
-            }
-        }
-    ]
+    # Checking the quality (not just membership) honors an explicit gzip;q=0
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = _SAMPLE_GZ_ETAG if use_gzip else _SAMPLE_ETAG
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(_SAMPLE_GZ if use_gzip else _SAMPLE_BYTES, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
     
-    return jsonify(sample_datasets)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    model_status = "loaded" if model is not None and scaler is not None else "not loaded"
+    model_status = "loaded" if session is not None else "not loaded"
     return jsonify({
         'status': 'healthy',
         'model_status': model_status
@@ -1,116 +1,140 @@
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler
-import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
 import warnings
 warnings.filterwarnings('ignore')
 
+# Model input features, in training/serving column order
+FEATURES = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3', 'Temperature', 'Humidity']
+
+# Realistic maximums for the six pollutant columns (PM2.5 through O3)
+POLLUTANT_CAPS = np.array([500, 600, 200, 100, 50, 300], dtype=np.float32)
+
 def calculate_aqi(pm25, pm10, no2, so2, co, o3):
     """
     Calculate AQI based on pollutant concentrations
     Simplified AQI calculation for demonstration
+
+    Accepts scalars or NumPy arrays and evaluates every sample at once.
     """
     # AQI breakpoints and corresponding concentration ranges
     # This is a simplified version - real AQI calculation is more complex
-    
+    pm25 = np.asarray(pm25, dtype=float)
+    pm10 = np.asarray(pm10, dtype=float)
+
     # PM2.5 AQI calculation (µg/m³)
-    if pm25 <= 12:
-        aqi_pm25 = pm25 * 50 / 12
-    elif pm25 <= 35.4:
-        aqi_pm25 = 50 + (pm25 - 12) * 50 / (35.4 - 12)
-    elif pm25 <= 55.4:
-        aqi_pm25 = 100 + (pm25 - 35.4) * 50 / (55.4 - 35.4)
-    elif pm25 <= 150.4:
-        aqi_pm25 = 150 + (pm25 - 55.4) * 100 / (150.4 - 55.4)
-    elif pm25 <= 250.4:
-        aqi_pm25 = 200 + (pm25 - 150.4) * 100 / (250.4 - 150.4)
-    else:
-        aqi_pm25 = 300 + (pm25 - 250.4) * 200 / (500.4 - 250.4)
-    
+    aqi_pm25 = np.piecewise(
+        pm25,
+        [pm25 <= 12,
+         (pm25 > 12) & (pm25 <= 35.4),
+         (pm25 > 35.4) & (pm25 <= 55.4),
+         (pm25 > 55.4) & (pm25 <= 150.4),
+         (pm25 > 150.4) & (pm25 <= 250.4)],
+        [lambda x: x * 50 / 12,
+         lambda x: 50 + (x - 12) * 50 / (35.4 - 12),
+         lambda x: 100 + (x - 35.4) * 50 / (55.4 - 35.4),
+         lambda x: 150 + (x - 55.4) * 100 / (150.4 - 55.4),
+         lambda x: 200 + (x - 150.4) * 100 / (250.4 - 150.4),
+         lambda x: 300 + (x - 250.4) * 200 / (500.4 - 250.4)]
+    )
+
     # PM10 AQI calculation (µg/m³)
-    if pm10 <= 54:
-        aqi_pm10 = pm10 * 50 / 54
-    elif pm10 <= 154:
-        aqi_pm10 = 50 + (pm10 - 54) * 50 / (154 - 54)
-    elif pm10 <= 254:
-        aqi_pm10 = 100 + (pm10 - 154) * 50 / (254 - 154)
-    elif pm10 <= 354:
-        aqi_pm10 = 150 + (pm10 - 254) * 100 / (354 - 254)
-    elif pm10 <= 424:
-        aqi_pm10 = 200 + (pm10 - 354) * 100 / (424 - 354)
-    else:
-        aqi_pm10 = 300 + (pm10 - 424) * 200 / (604 - 424)
-    
+    aqi_pm10 = np.piecewise(
+        pm10,
+        [pm10 <= 54,
+         (pm10 > 54) & (pm10 <= 154),
+         (pm10 > 154) & (pm10 <= 254),
+         (pm10 > 254) & (pm10 <= 354),
+         (pm10 > 354) & (pm10 <= 424)],
+        [lambda x: x * 50 / 54,
+         lambda x: 50 + (x - 54) * 50 / (154 - 54),
+         lambda x: 100 + (x - 154) * 50 / (254 - 154),
+         lambda x: 150 + (x - 254) * 100 / (354 - 254),
+         lambda x: 200 + (x - 354) * 100 / (424 - 354),
+         lambda x: 300 + (x - 424) * 200 / (604 - 424)]
+    )
+
     # Simplified calculations for other pollutants
     # NO2 (ppb)
-    aqi_no2 = min(no2 * 2, 500)
-    
+    aqi_no2 = np.minimum(np.multiply(no2, 2), 500)
+
     # SO2 (ppb)
-    aqi_so2 = min(so2 * 3, 500)
-    
+    aqi_so2 = np.minimum(np.multiply(so2, 3), 500)
+
     # CO (ppm)
-    aqi_co = min(co * 50, 500)
-    
+    aqi_co = np.minimum(np.multiply(co, 50), 500)
+
     # O3 (ppb)
-    aqi_o3 = min(o3 * 1.5, 500)
-    
+    aqi_o3 = np.minimum(np.multiply(o3, 1.5), 500)
+
     # Return the maximum AQI (dominant pollutant)
-    return max(aqi_pm25, aqi_pm10, aqi_no2, aqi_so2, aqi_co, aqi_o3)
+    return np.maximum.reduce([aqi_pm25, aqi_pm10, aqi_no2, aqi_so2, aqi_co, aqi_o3])
 
 def generate_synthetic_data(n_samples=5000):
     """Generate synthetic air quality data for training"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
+    
+    # Preallocate one float32 buffer with a contiguous column per feature;
+    # everything below fills or updates these column views in place
+    arr = np.empty((n_samples, len(FEATURES)), dtype=np.float32, order='F')
+    pm25, pm10, no2, so2, co, o3, temperature, humidity = arr.T
+    tmp = np.empty(n_samples, dtype=np.float32)
     
     # Generate realistic air quality parameters
-    pm25 = np.random.exponential(15, n_samples)  # PM2.5 (µg/m³)
-    pm10 = pm25 * np.random.uniform(1.2, 2.5, n_samples)  # PM10 usually higher than PM2.5
-    no2 = np.random.exponential(20, n_samples)  # NO2 (ppb)
-    so2 = np.random.exponential(5, n_samples)   # SO2 (ppb)
-    co = np.random.exponential(1, n_samples)    # CO (ppm)
-    o3 = np.random.exponential(30, n_samples)   # O3 (ppb)
+    # (draws go straight into the columns, then get scaled/shifted in place)
+    rng.standard_exponential(dtype=np.float32, out=pm25)  # PM2.5 (µg/m³)
+    pm25 *= 15
+    rng.random(dtype=np.float32, out=pm10)  # PM10 usually higher than PM2.5
+    pm10 *= 1.3
+    pm10 += 1.2
+    pm10 *= pm25
+    rng.standard_exponential(dtype=np.float32, out=no2)  # NO2 (ppb)
+    no2 *= 20
+    rng.standard_exponential(dtype=np.float32, out=so2)  # SO2 (ppb)
+    so2 *= 5
+    rng.standard_exponential(dtype=np.float32, out=co)  # CO (ppm)
+    rng.standard_exponential(dtype=np.float32, out=o3)  # O3 (ppb)
+    o3 *= 30
     
     # Weather parameters
-    temperature = np.random.normal(25, 10, n_samples)  # Temperature (°C)
-    humidity = np.random.uniform(30, 90, n_samples)    # Humidity (%)
+    rng.standard_normal(dtype=np.float32, out=temperature)  # Temperature (°C)
+    temperature *= 10
+    temperature += 25
+    rng.random(dtype=np.float32, out=humidity)  # Humidity (%)
+    humidity *= 60
+    humidity += 30
     
     # Add some correlations for realism
     # Higher temperature can increase O3
-    o3 += temperature * 0.5 + np.random.normal(0, 5, n_samples)
-    o3 = np.maximum(o3, 0)
+    np.multiply(temperature, 0.5, out=tmp)
+    o3 += tmp
+    rng.standard_normal(dtype=np.float32, out=tmp)
+    tmp *= 5
+    o3 += tmp
     
     # Higher humidity can affect particulate matter
-    pm25 += humidity * 0.1 + np.random.normal(0, 2, n_samples)
-    pm25 = np.maximum(pm25, 0)
-    
-    # Cap values at realistic maximums
-    pm25 = np.minimum(pm25, 500)
-    pm10 = np.minimum(pm10, 600)
-    no2 = np.minimum(no2, 200)
-    so2 = np.minimum(so2, 100)
-    co = np.minimum(co, 50)
-    o3 = np.minimum(o3, 300)
-    
-    # Calculate AQI for each sample
-    aqi_values = []
-    for i in range(n_samples):
-        aqi = calculate_aqi(pm25[i], pm10[i], no2[i], so2[i], co[i], o3[i])
-        aqi_values.append(aqi)
+    np.multiply(humidity, 0.1, out=tmp)
+    pm25 += tmp
+    rng.standard_normal(dtype=np.float32, out=tmp)
+    tmp *= 2
+    pm25 += tmp
+    
+    # Clamp at zero and cap values at realistic maximums in one pass over
+    # the (contiguous) pollutant columns
+    pollutants = arr[:, :len(POLLUTANT_CAPS)]
+    np.clip(pollutants, 0, POLLUTANT_CAPS, out=pollutants)
+    
+    # Calculate AQI for all samples in one vectorized pass
+    aqi_values = calculate_aqi(pm25, pm10, no2, so2, co, o3)
     
     # Create DataFrame
-    data = pd.DataFrame({
-        'PM2.5': pm25,
-        'PM10': pm10,
-        'NO2': no2,
-        'SO2': so2,
-        'CO': co,
-        'O3': o3,
-        'Temperature': temperature,
-        'Humidity': humidity,
-        'AQI': aqi_values
-    })
+    data = pd.DataFrame(arr, columns=FEATURES)
+    data['AQI'] = aqi_values
     
     return data
 
@@ -123,31 +147,29 @@ def train_model():
     print(f"AQI range: {data['AQI'].min():.2f} - {data['AQI'].max():.2f}")
     
     # Features and target
-    features = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3', 'Temperature', 'Humidity']
-    X = data[features]
-    y = data['AQI']
+    # float32 halves the memory traffic while fitting and matches the
+    # float32 input of the exported ONNX graph
+    features = FEATURES
+    X = data[features].to_numpy(dtype=np.float32)
+    y = data['AQI'].to_numpy(dtype=np.float32)
     
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Scale the features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Train Random Forest model
-    print("Training Random Forest model...")
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=15,
-        random_state=42,
-        n_jobs=-1
+    # Train Histogram Gradient Boosting model
+    # Tree splits are scale-invariant, so no feature scaler is needed
+    print("Training Histogram Gradient Boosting model...")
+    model = HistGradientBoostingRegressor(
+        max_iter=300,
+        max_depth=8,
+        learning_rate=0.05,
+        random_state=42
     )
     
-    model.fit(X_train_scaled, y_train)
+    model.fit(X_train, y_train)
     
     # Make predictions
-    y_pred = model.predict(X_test_scaled)
+    y_pred = model.predict(X_test)
     
     # Evaluate model
     mse = mean_squared_error(y_test, y_pred)
@@ -158,10 +180,11 @@ def train_model():
     print(f"R2 Score: {r2:.4f}")
     print(f"RMSE: {np.sqrt(mse):.2f}")
     
-    # Feature importance
+    # Feature importance (permutation-based on the test set)
+    importance = permutation_importance(model, X_test, y_test, n_repeats=5, random_state=42)
     feature_importance = pd.DataFrame({
         'feature': features,
-        'importance': model.feature_importances_
+        'importance': importance.importances_mean
     }).sort_values('importance', ascending=False)
     # Save sample training data
     data.head(20).to_csv("sample_training_data.csv", index=False)
@@ -171,7 +194,7 @@ def train_model():
 
     # Save model summary to text file
     with open("model_summary.txt", "w") as f:
-        f.write("Random Forest Regressor Model\n")
+        f.write("Histogram Gradient Boosting Regressor Model\n")
         f.write(f"R2 Score: {r2:.4f}\n")
         f.write(f"MSE: {mse:.2f}\n")
         f.write(f"RMSE: {np.sqrt(mse):.2f}\n\n")
@@ -182,15 +205,19 @@ def train_model():
     print("\nFeature Importance:")
     print(feature_importance)
     
-    # Save the model and scaler
-    print("\nSaving model and scaler...")
-    joblib.dump(model, 'aqi_model.pkl')
-    joblib.dump(scaler, 'scaler.pkl')
+    # Export the model as an ONNX graph for serving
+    print("\nSaving model...")
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[('input', FloatTensorType([None, len(features)]))]
+    )
+    with open('aqi_model.onnx', 'wb') as f:
+        f.write(onnx_model.SerializeToString())
     
     print("Model training completed successfully!")
-    print("Files saved: aqi_model.pkl, scaler.pkl")
+    print("Files saved: aqi_model.onnx")
     
-    return model, scaler
+    return model
 
 if __name__ == "__main__":
     train_model()
\ No newline at end of file
@@ -0,0 +1,12 @@
+# WSGI entry point for production servers, e.g.:
+#
+#     gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+#
+# The model is loaded here, at import time, so each worker is ready (and warmed
+# up) before it accepts its first request. Don't add --preload: onnxruntime is
+# not fork-safe, and workers forked after it is imported crash or hang on exit.
+# The ONNX model is small, so a copy per worker costs well under a megabyte.
+from app import app, load_model
+
+if not load_model():
+    print("WARNING: Model files not found. Please run 'python model_train.py' first.")